@@ -4,18 +4,37 @@ GitHub MCP Server
 Provides GitHub API access via Model Context Protocol using Gradio
 """
 
-import base64
-import json
+import asyncio
+import binascii
+import functools
 import logging
 import os
-from typing import List, Dict, Any
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple, TypeVar
+from urllib.parse import parse_qs, urlsplit
 
 import aiohttp
 import gradio as gr
+import orjson
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
 GITHUB_API_BASE = os.getenv("GITHUB_API_BASE_URL", "https://api.github.com")
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "15"))
+# GitHub Enterprise serves REST under /api/v3 and GraphQL under /api/graphql
+GITHUB_GRAPHQL_URL = (
+    GITHUB_API_BASE.rstrip("/").removesuffix("/v3") + "/graphql"
+)
+GITHUB_AUTHORIZATION = f"token {GITHUB_TOKEN}" if GITHUB_TOKEN else ""
+
+# GitHub REST URL templates (base URL is fixed at import)
+SEARCH_CODE_URL = f"{GITHUB_API_BASE}/search/code"
+ORG_REPOS_URL_TEMPLATE = GITHUB_API_BASE + "/orgs/{}/repos"
+CONTENTS_URL_TEMPLATE = GITHUB_API_BASE + "/repos/{}/{}/contents/{}"
 
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL.upper()),
@@ -26,6 +45,75 @@ logger = logging.getLogger(__name__)
 # API Constants
 RESULTS_PER_PAGE = 100
 SEARCH_RESULTS_LIMIT = 50
+SEARCH_MAX_PAGES = 10  # Code search returns at most 1000 results
+SEARCH_QUOTA_RESERVE = 3  # Code search requests left for search_documentation
+
+# Lists org repositories with a /doc existence check in a single query
+ORG_REPOS_GRAPHQL_QUERY = """
+query($org: String!, $cursor: String) {
+  organization(login: $org) {
+    repositories(first: 100, after: $cursor) {
+      pageInfo { endCursor hasNextPage }
+      nodes {
+        databaseId
+        name
+        description
+        url
+        object(expression: "HEAD:doc") { __typename }
+      }
+    }
+  }
+}
+"""
+
+# Supported documentation file extensions
+EXTENSION_CONTENT_TYPES = {
+    '.md': 'markdown',
+    '.mmd': 'mermaid',
+    '.mermaid': 'mermaid',
+    '.svg': 'svg',
+    '.yml': 'openapi',
+    '.yaml': 'openapi',
+    '.json': 'openapi',  # Postman collections are detected by filename
+}
+
+# HTTP client settings (shared connection pool for all GitHub calls)
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 50
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 75
+REQUEST_TIMEOUT = 30
+
+# Rate limit handling (a call stops retrying MAX_RETRY_DELAY seconds after
+# its first backoff; longer waits surface as errors)
+MAX_RETRIES = 2
+MAX_RETRY_DELAY = 60
+
+# Response cache TTLs in seconds (entries are revalidated via ETag once stale)
+SEARCH_CACHE_TTL = 60
+CONTENTS_CACHE_TTL = 300
+REPOS_CACHE_TTL = 900
+
+# The session and rate limiter are bound to the event loop that created them
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Cache key -> (etag, parsed JSON, Link header rels, expires_at, body size),
+# in LRU order. File contents carry up to ~1.3 MB of base64, so the cache is
+# capped by total response body bytes as well as by entry count.
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_response_cache: OrderedDict[Tuple[str, Tuple], Tuple[str, Any, Dict[str, str], float, int]] = OrderedDict()
+_response_cache_bytes = 0
+
+# Blob SHA -> raw file text (content-addressed, so entries never go stale),
+# in LRU order. Only files over 1 MB land here, so the cap is on total size.
+RAW_CONTENT_CACHE_MAX_CHARS = 32 * 1024 * 1024
+_raw_content_cache: OrderedDict[str, str] = OrderedDict()
+_raw_content_cache_chars = 0
+
+# Base64 payloads at least this long are decoded off the event loop
+THREADED_DECODE_THRESHOLD = 256 * 1024
 
 
 # ============================================================================
@@ -45,12 +133,523 @@ def create_headers() -> Dict[str, str]:
     }
 
     # Add authorization if token is available
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    if GITHUB_AUTHORIZATION:
+        headers["Authorization"] = GITHUB_AUTHORIZATION
 
     return headers
 
 
+# GITHUB_TOKEN is read once at import, so the headers never change
+# (read-only so the shared dict cannot be mutated per request)
+GITHUB_HEADERS = MappingProxyType(create_headers())
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Get the shared aiohttp ClientSession, creating it on first use
+
+    Reusing one session keeps the connection pool (and TLS connections to
+    the GitHub API) alive across tool calls instead of re-handshaking on
+    every request. A session left over from another event loop (e.g. an
+    earlier asyncio.run) is abandoned and replaced.
+
+    Returns:
+        Shared ClientSession with GitHub API headers applied
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is not None and _session_loop is not loop:
+        # Its connections belong to the other loop, which may be closed
+        _session.detach()
+        _session = None
+
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTION_LIMIT,
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers=GITHUB_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+        _session_loop = loop
+
+    return _session
+
+
+async def close_session() -> None:
+    """
+    Close the shared aiohttp ClientSession if it is open
+
+    Callers that run the business functions under their own event loop
+    (e.g. asyncio.run) should await this before the loop ends.
+    """
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        if _session_loop is asyncio.get_running_loop():
+            await _session.close()
+        else:
+            _session.detach()
+    _session = None
+    _session_loop = None
+
+
+class GitHubRateLimiter:
+    """
+    Caps in-flight GitHub requests and pauses them per rate limit resource
+
+    Requests enter through ``async with limiter.slot(resource)``. When a
+    response says to back off, pause() closes that resource's gate for the
+    given delay so that other callers of the same resource wait instead of
+    hitting the same limit. Requests to other resources keep flowing.
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._gates: Dict[str, asyncio.Event] = {}
+        # Resource -> (X-RateLimit-Remaining, X-RateLimit-Reset epoch)
+        self._quota: Dict[str, Tuple[int, int]] = {}
+
+    def _gate(self, resource: str) -> asyncio.Event:
+        gate = self._gates.get(resource)
+        if gate is None:
+            gate = self._gates[resource] = asyncio.Event()
+            gate.set()
+        return gate
+
+    @asynccontextmanager
+    async def slot(self, resource: str) -> AsyncIterator[None]:
+        """
+        Hold one of the concurrent request slots for a request to resource
+
+        Args:
+            resource: Rate limit resource of the request (see
+                rate_limit_resource)
+        """
+        gate = self._gate(resource)
+
+        await self._semaphore.acquire()
+        # Callers queued on the semaphore must not slip through a pause
+        while not gate.is_set():
+            self._semaphore.release()
+            await gate.wait()
+            await self._semaphore.acquire()
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    def record_quota(self, resource: str, response: aiohttp.ClientResponse) -> None:
+        """
+        Remember the remaining quota reported by a response
+
+        Args:
+            resource: Rate limit resource of the request
+            response: GitHub API response
+        """
+        remaining = response.headers.get("X-RateLimit-Remaining", "")
+        reset = response.headers.get("X-RateLimit-Reset", "")
+        if remaining.isdigit() and reset.isdigit():
+            self._quota[resource] = (int(remaining), int(reset))
+
+    def remaining(self, resource: str) -> Optional[int]:
+        """
+        Get the last reported remaining quota of a resource
+
+        Args:
+            resource: Rate limit resource
+
+        Returns:
+            Requests left in the current window, or None if unknown or the
+            window has since reset
+        """
+        quota = self._quota.get(resource)
+        if quota is None or quota[1] <= time.time():
+            return None
+        return quota[0]
+
+    async def pause(self, resource: str, delay: float) -> None:
+        """
+        Block new requests to resource for delay seconds (or wait out an
+        ongoing pause)
+
+        Args:
+            resource: Rate limit resource that is exhausted
+            delay: Seconds to wait before requests may resume
+        """
+        gate = self._gate(resource)
+        if not gate.is_set():
+            await gate.wait()
+            return
+
+        gate.clear()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            gate.set()
+
+
+# Shared by all tool calls on the same event loop
+_rate_limiter: Optional[GitHubRateLimiter] = None
+_rate_limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_rate_limiter() -> GitHubRateLimiter:
+    """
+    Get the shared rate limiter for the running event loop
+
+    asyncio primitives cannot be shared between loops, so a new limiter is
+    created whenever the running loop changes.
+
+    Returns:
+        GitHubRateLimiter capped at GITHUB_MAX_CONCURRENCY
+    """
+    global _rate_limiter, _rate_limiter_loop
+
+    loop = asyncio.get_running_loop()
+    if _rate_limiter is None or _rate_limiter_loop is not loop:
+        _rate_limiter = GitHubRateLimiter(GITHUB_MAX_CONCURRENCY)
+        _rate_limiter_loop = loop
+
+    return _rate_limiter
+
+
+def rate_limit_resource(url: str) -> str:
+    """
+    Map a request URL to the GitHub rate limit resource it counts against
+
+    The names follow GitHub's X-RateLimit-Resource header. Non-API hosts
+    (raw downloads) are keyed by host name.
+
+    Args:
+        url: Request URL
+
+    Returns:
+        Resource name such as 'core', 'search', 'code_search' or 'graphql'
+    """
+    if url == GITHUB_GRAPHQL_URL:
+        return "graphql"
+    if url.startswith(SEARCH_CODE_URL):
+        return "code_search"
+    if url.startswith(f"{GITHUB_API_BASE}/search/"):
+        return "search"
+    if url.startswith(GITHUB_API_BASE):
+        return "core"
+    return urlsplit(url).netloc
+
+
+def get_retry_delay(response: aiohttp.ClientResponse) -> Optional[float]:
+    """
+    Determine how long to wait before retrying a rate-limited response
+
+    Honors Retry-After (secondary rate limits) and X-RateLimit-Reset when
+    X-RateLimit-Remaining is exhausted (primary rate limit).
+
+    Args:
+        response: GitHub API response
+
+    Returns:
+        Seconds to wait, or None if the response should not be retried
+    """
+    if response.status not in (403, 429):
+        return None
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        delay = float(retry_after)
+    elif response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = response.headers.get("X-RateLimit-Reset", "")
+        if not reset.isdigit():
+            return None
+        delay = max(0.0, int(reset) - time.time())
+    else:
+        return None
+
+    return delay if delay <= MAX_RETRY_DELAY else None
+
+
+# Backoff budget of the running business function call, shared with the
+# tasks it spawns; holds a "deadline" once the call first backs off
+_backoff_budget: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "backoff_budget", default=None
+)
+
+T = TypeVar("T")
+
+
+def rate_limit_budget(
+    func: Callable[..., Awaitable[T]]
+) -> Callable[..., Awaitable[T]]:
+    """
+    Cap the total rate limit backoff of each call to a business function
+
+    The first backoff within a call starts a MAX_RETRY_DELAY window; after
+    it, github_request returns rate-limited responses instead of retrying.
+    Nested calls share the outer call's budget.
+
+    Args:
+        func: Async business function
+
+    Returns:
+        Wrapped function
+    """
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        if _backoff_budget.get() is not None:
+            return await func(*args, **kwargs)
+
+        token = _backoff_budget.set({})
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _backoff_budget.reset(token)
+
+    return wrapper
+
+
+@asynccontextmanager
+async def github_request(
+    session: aiohttp.ClientSession,
+    method: str,
+    url: str,
+    **kwargs: Any
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    Issue a GitHub request under the shared rate limiter
+
+    Rate-limited responses carrying a short Retry-After or rate limit reset
+    pause requests to the same rate limit resource for that long and are
+    then retried, up to MAX_RETRIES times. Retries stop once they would run
+    past the calling function's backoff budget (see rate_limit_budget).
+
+    Args:
+        session: Shared aiohttp ClientSession (see get_session)
+        method: HTTP method
+        url: Request URL
+        **kwargs: Passed through to session.request
+
+    Yields:
+        The final aiohttp response
+    """
+    rate_limiter = get_rate_limiter()
+    resource = rate_limit_resource(url)
+    budget = _backoff_budget.get()
+    if budget is None:
+        # Called outside a business function: the budget covers this request
+        budget = {}
+
+    for attempt in range(MAX_RETRIES + 1):
+        async with rate_limiter.slot(resource):
+            async with session.request(method, url, **kwargs) as response:
+                rate_limiter.record_quota(resource, response)
+                delay = get_retry_delay(response)
+                if delay is not None and attempt < MAX_RETRIES:
+                    now = time.monotonic()
+                    deadline = budget.setdefault("deadline", now + MAX_RETRY_DELAY)
+                    if now + delay > deadline:
+                        delay = None
+
+                if delay is None or attempt == MAX_RETRIES:
+                    yield response
+                    return
+
+        logger.warning("Rate limited on %s, retrying in %.0fs", url, delay)
+        await rate_limiter.pause(resource, delay)
+
+
+@asynccontextmanager
+async def session_lifespan(app: Any) -> AsyncIterator[None]:
+    """
+    Server lifespan hook that closes the shared session on shutdown
+
+    Args:
+        app: The ASGI app being served (unused)
+    """
+    yield
+    await close_session()
+
+
+async def read_json(response: aiohttp.ClientResponse) -> Any:
+    """
+    Parse a GitHub response body with orjson
+
+    Parses the raw bytes directly, skipping aiohttp's decode to str and its
+    Content-Type check.
+
+    Args:
+        response: GitHub API response
+
+    Returns:
+        Parsed JSON
+    """
+    return orjson.loads(await response.read())
+
+
+def store_cached_response(
+    key: Tuple[str, Tuple],
+    entry: Tuple[str, Any, Dict[str, str], float, int]
+) -> None:
+    """
+    Store a response cache entry, evicting the least recently used if full
+
+    Args:
+        key: Cache key (URL and sorted query parameters)
+        entry: Tuple of (etag, parsed JSON, Link header rels, expires_at,
+            body size in bytes)
+    """
+    global _response_cache_bytes
+
+    previous = _response_cache.pop(key, None)
+    if previous:
+        _response_cache_bytes -= previous[4]
+
+    _response_cache[key] = entry
+    _response_cache_bytes += entry[4]
+    while (
+        len(_response_cache) > RESPONSE_CACHE_SIZE
+        or _response_cache_bytes > RESPONSE_CACHE_MAX_BYTES
+    ):
+        _, evicted = _response_cache.popitem(last=False)
+        _response_cache_bytes -= evicted[4]
+
+
+async def cached_get_json(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    ttl: float = CONTENTS_CACHE_TTL
+) -> Tuple[int, Any, Dict[str, str]]:
+    """
+    GET a GitHub API URL through an in-process, ETag-aware TTL cache
+
+    Fresh entries are served without a request. Stale entries are
+    revalidated with If-None-Match; a 304 reply reuses the cached body and
+    does not count against GitHub's primary rate limit.
+
+    Args:
+        session: Shared aiohttp ClientSession (see get_session)
+        url: GitHub API URL
+        params: Optional query parameters
+        ttl: Seconds a response is served without revalidation
+
+    Returns:
+        Tuple of (status, payload, links): payload is the parsed JSON when
+        status is 200, otherwise the response body text; links maps Link
+        header rels (e.g. "next", "last") to URLs
+    """
+    key = (url, tuple(sorted((params or {}).items())))
+    entry = _response_cache.get(key)
+    now = time.monotonic()
+
+    if entry:
+        _response_cache.move_to_end(key)
+        if entry[3] > now:
+            return 200, entry[1], entry[2]
+
+    headers = {"If-None-Match": entry[0]} if entry and entry[0] else None
+
+    async with github_request(session, "GET", url, params=params, headers=headers) as response:
+        if response.status == 304 and entry:
+            store_cached_response(key, (entry[0], entry[1], entry[2], now + ttl, entry[4]))
+            return 200, entry[1], entry[2]
+
+        if response.status != 200:
+            return response.status, await response.text(), {}
+
+        body = await response.read()
+        data = orjson.loads(body)
+        links = {
+            str(rel): str(link["url"])
+            for rel, link in response.links.items()
+        }
+        store_cached_response(
+            key, (response.headers.get("ETag", ""), data, links, now + ttl, len(body))
+        )
+        return 200, data, links
+
+
+def store_raw_content(sha: str, content: str) -> None:
+    """
+    Store a raw file body, evicting the least recently used while over budget
+
+    Args:
+        sha: Git blob SHA of the file
+        content: File content as text
+    """
+    global _raw_content_cache_chars
+
+    previous = _raw_content_cache.pop(sha, None)
+    if previous is not None:
+        _raw_content_cache_chars -= len(previous)
+
+    _raw_content_cache[sha] = content
+    _raw_content_cache_chars += len(content)
+    while _raw_content_cache_chars > RAW_CONTENT_CACHE_MAX_CHARS:
+        _, evicted = _raw_content_cache.popitem(last=False)
+        _raw_content_cache_chars -= len(evicted)
+
+
+async def fetch_raw_content(
+    session: aiohttp.ClientSession,
+    download_url: str,
+    sha: str
+) -> str:
+    """
+    Download a file body from its raw.githubusercontent.com URL
+
+    Raw URLs are addressed by blob SHA, so downloads are cached by SHA and
+    never need revalidation. Bodies larger than the whole cache budget are
+    not cached.
+
+    Args:
+        session: Shared aiohttp ClientSession (see get_session)
+        download_url: Raw download URL from the contents API
+        sha: Git blob SHA of the file
+
+    Returns:
+        File content as text
+    """
+    if sha and sha in _raw_content_cache:
+        _raw_content_cache.move_to_end(sha)
+        return _raw_content_cache[sha]
+
+    async with github_request(session, "GET", download_url) as response:
+        if response.status != 200:
+            error_text = await response.text()
+            raise Exception(f"GitHub raw download error {response.status}: {error_text}")
+
+        content = await response.text()
+
+    if sha and len(content) <= RAW_CONTENT_CACHE_MAX_CHARS:
+        store_raw_content(sha, content)
+
+    return content
+
+
+def get_last_page(links: Dict[str, str]) -> int:
+    """
+    Extract the last page number from parsed Link header rels
+
+    Args:
+        links: Link header rels as returned by cached_get_json
+
+    Returns:
+        Page number of the rel="last" link, or 0 if there is none
+    """
+    last_url = links.get("last")
+    if not last_url:
+        return 0
+
+    pages = parse_qs(urlsplit(last_url).query).get("page")
+    return int(pages[0]) if pages else 0
+
+
 async def check_doc_folder(
     session: aiohttp.ClientSession,
     org: str,
@@ -59,144 +658,310 @@ async def check_doc_folder(
     """
     Check if a repository has a /doc folder
 
+    Uses a HEAD request so GitHub answers 200/404 without sending the
+    directory listing body.
+
     Args:
-        session: aiohttp ClientSession (reuse connection)
+        session: Shared aiohttp ClientSession (see get_session)
         org: Organization name
         repo: Repository name
 
     Returns:
         True if /doc folder exists, False otherwise
     """
-    headers = create_headers()
-    url = f"{GITHUB_API_BASE}/repos/{org}/{repo}/contents/doc"
+    url = CONTENTS_URL_TEMPLATE.format(org, repo, "doc")
 
     try:
-        async with session.get(url, headers=headers) as response:
+        async with github_request(session, "HEAD", url, allow_redirects=True) as response:
             return response.status == 200
     except Exception as e:
-        logger.debug(f"Error checking /doc folder for {org}/{repo}: {e}")
+        logger.debug("Error checking /doc folder for %s/%s: %s", org, repo, e)
         return False
 
 
+def file_extension(filename: str) -> str:
+    """
+    Get the lowercased extension of a filename
+
+    Args:
+        filename: Name of the file
+
+    Returns:
+        Extension including the leading dot (e.g. '.md'), or '' if none
+    """
+    dot = filename.rfind('.')
+    return filename[dot:].lower() if dot != -1 else ''
+
+
+def decode_base64_content(encoded: str) -> str:
+    """
+    Decode base64 file content returned by the GitHub contents API
+
+    GitHub wraps the payload with newlines, which a2b_base64 skips without
+    needing a stripped copy.
+
+    Args:
+        encoded: Base64-encoded content
+
+    Returns:
+        Decoded UTF-8 text
+    """
+    return binascii.a2b_base64(encoded).decode('utf-8')
+
+
+@functools.lru_cache(maxsize=1024)
 def determine_content_type(filename: str) -> str:
     """
     Determine content type from filename
 
+    Cached: the same names (README.md, openapi.yaml, ...) recur across repos.
+
     Args:
         filename: Name of the file
 
     Returns:
         Content type: 'markdown', 'mermaid', 'svg', 'openapi', 'postman', or 'unknown'
     """
-    lower_name = filename.lower()
-
-    if lower_name.endswith(('.mmd', '.mermaid')):
-        return 'mermaid'
-    elif lower_name.endswith('.md'):
-        return 'markdown'
-    elif lower_name.endswith('.svg'):
-        return 'svg'
-    elif lower_name.endswith(('.yml', '.yaml')):
-        return 'openapi'
-    elif lower_name.endswith('.json'):
-        # Check if it's a Postman collection first, otherwise assume OpenAPI
-        return 'postman' if lower_name.startswith('postman') else 'openapi'
-    else:
-        return 'unknown'
+    extension = file_extension(filename)
+    if extension == '.json' and filename.lower().startswith('postman'):
+        return 'postman'
+
+    return EXTENSION_CONTENT_TYPES.get(extension, 'unknown')
 
 
 # ============================================================================
 # Business Logic Functions (testable)
 # ============================================================================
 
+@rate_limit_budget
+async def get_org_repos_graphql(org: str) -> List[Dict[str, Any]]:
+    """
+    Fetch all repositories of an organization with /doc detection via GraphQL
+
+    Each page of 100 repositories carries a HEAD:doc object lookup, so the
+    /doc check needs no per-repository requests. Requires a GITHUB_TOKEN.
+
+    Args:
+        org: GitHub organization name
+
+    Returns:
+        List of repository dictionaries in the same shape as get_org_repos
+
+    Raises:
+        Exception: If the GraphQL API returns an error
+    """
+    session = await get_session()
+    result = []
+    cursor = None
+
+    while True:
+        payload = {"query": ORG_REPOS_GRAPHQL_QUERY, "variables": {"org": org, "cursor": cursor}}
+
+        async with github_request(
+            session,
+            "POST",
+            GITHUB_GRAPHQL_URL,
+            data=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"GitHub GraphQL error {response.status}: {error_text}")
+
+            data = await read_json(response)
+
+        if data.get("errors"):
+            raise Exception(f"GitHub GraphQL error: {data['errors'][0].get('message', '')}")
+
+        organization = (data.get("data") or {}).get("organization")
+        if organization is None:
+            raise Exception(f"Organization not found: {org}")
+
+        repositories = organization["repositories"]
+        for node in repositories["nodes"]:
+            database_id = node.get("databaseId")
+            result.append({
+                "id": "" if database_id is None else str(database_id),
+                "name": node["name"],
+                "description": node.get("description") or "",
+                "url": node["url"],
+                "hasDocFolder": node.get("object") is not None
+            })
+
+        page_info = repositories["pageInfo"]
+        if not page_info["hasNextPage"]:
+            break
+        cursor = page_info["endCursor"]
+
+    return result
+
+
+@rate_limit_budget
 async def get_org_repos(org: str) -> List[Dict[str, Any]]:
-    async with aiohttp.ClientSession() as session:
-        headers = create_headers()
+    session = await get_session()
 
-        # Strategy 1: Use GitHub Search API (efficient - one request)
-        search_url = f"{GITHUB_API_BASE}/search/code"
+    # Strategy 1: Use GitHub Search API (efficient - one request per 100 hits)
+    try:
         params = {
             "q": f"org:{org} path:/doc",
             "per_page": RESULTS_PER_PAGE
         }
+        status, data, links = await cached_get_json(
+            session, SEARCH_CODE_URL, params, SEARCH_CACHE_TTL
+        )
+        if status != 200:
+            raise Exception(f"GitHub API error {status}: {data}")
+
+        item_pages = [data.get("items", [])]
+
+        # Code search allows only a handful of requests per minute, so later
+        # pages follow rel="next" one at a time and stop before the quota
+        # that search_documentation needs is used up
+        rate_limiter = get_rate_limiter()
+        while (next_url := links.get("next")) and len(item_pages) < SEARCH_MAX_PAGES:
+            remaining = rate_limiter.remaining("code_search")
+            if remaining is not None and remaining <= SEARCH_QUOTA_RESERVE:
+                logger.warning(
+                    "Code search quota low (%d left), stopping at page %d",
+                    remaining, len(item_pages)
+                )
+                break
+
+            status, data, links = await cached_get_json(
+                session, next_url, ttl=SEARCH_CACHE_TTL
+            )
+            if status != 200:
+                logger.warning(
+                    "Search page %d failed with %d, keeping earlier pages",
+                    len(item_pages) + 1, status
+                )
+                break
+
+            item_pages.append(data.get("items", []))
+
+        # Extract unique repositories from search results (many hits share a
+        # repo, so only references are stored until the output dicts are built)
+        unique_repos = {
+            repo_info["name"]: repo_info
+            for page_items in item_pages
+            for item in page_items
+            if (repo_info := item.get("repository")) and repo_info.get("name")
+        }
+        repos_with_docs = [
+            {
+                "id": str(repo_info.get("id", "")),
+                "name": repo_name,
+                "description": repo_info.get("description") or "",
+                "url": repo_info.get("html_url", ""),
+                "hasDocFolder": True
+            }
+            for repo_name, repo_info in unique_repos.items()
+        ]
+
+        logger.info("Found %d repos with /doc via search", len(repos_with_docs))
+        return repos_with_docs
+
+    except Exception as e:
+        logger.warning("Search API failed: %s, falling back to list all repos", e)
 
+    # Strategy 2: Use GraphQL (one request per 100 repos, /doc check included)
+    if GITHUB_TOKEN:
         try:
-            async with session.get(search_url, headers=headers, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-
-                    # Extract unique repositories from search results
-                    repos_with_docs = {}
-                    for item in data.get("items", []):
-                        repo_info = item.get("repository", {})
-                        repo_name = repo_info.get("name")
-
-                        if repo_name and repo_name not in repos_with_docs:
-                            repos_with_docs[repo_name] = {
-                                "id": str(repo_info.get("id", "")),
-                                "name": repo_name,
-                                "description": repo_info.get("description") or "",
-                                "url": repo_info.get("html_url", ""),
-                                "hasDocFolder": True
-                            }
-
-                    logger.info(f"Found {len(repos_with_docs)} repos with /doc via search")
-                    return list(repos_with_docs.values())
+            result = await get_org_repos_graphql(org)
+            repos_with_docs_count = sum(1 for r in result if r["hasDocFolder"])
+            logger.info("Found %d repos with /doc folder via GraphQL", repos_with_docs_count)
+            return result
 
         except Exception as e:
-            logger.warning(f"Search API failed: {e}, falling back to list all repos")
-
-        # Strategy 2: Fallback - List all repos and check each one
-        repos_url = f"{GITHUB_API_BASE}/orgs/{org}/repos"
-        all_repos = []
+            logger.warning("GraphQL API failed: %s, falling back to REST listing", e)
+
+    # Strategy 3: Fallback - List all repos and check each one
+    repos_url = ORG_REPOS_URL_TEMPLATE.format(org)
+
+    async def fetch_page(page: int) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        status, repos, links = await cached_get_json(
+            session,
+            repos_url,
+            {"per_page": RESULTS_PER_PAGE, "page": page},
+            REPOS_CACHE_TTL
+        )
+        if status != 200:
+            raise Exception(f"GitHub API error {status}: {repos}")
+
+        logger.debug("Fetched page %d (%d repos)", page, len(repos))
+        return repos, links
+
+    logger.info("Fetching repos for organization: %s", org)
+
+    repos, links = await fetch_page(1)
+    all_repos = list(repos)
+    last_page = get_last_page(links)
+
+    if last_page > 1:
+        # Page count is known from the Link header: fetch the rest concurrently
+        # (github_request bounds how many run at once)
+        pages = await asyncio.gather(
+            *(fetch_page(page) for page in range(2, last_page + 1))
+        )
+        for repos, _ in pages:
+            all_repos.extend(repos)
+    else:
+        # No Link header: page sequentially until a short page
         page = 1
+        while len(repos) == RESULTS_PER_PAGE:
+            page += 1
+            repos, _ = await fetch_page(page)
+            all_repos.extend(repos)
 
-        logger.info(f"Fetching repos for organization: {org}")
+    logger.info("Total repos fetched: %d", len(all_repos))
 
-        while True:
-            async with session.get(
-                repos_url,
-                headers=headers,
-                params={"per_page": RESULTS_PER_PAGE, "page": page, "sort": "updated"}
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"GitHub API error {response.status}: {error_text}")
+    # Check repos for /doc folder concurrently (github_request bounds how
+    # many run at once)
+    total = len(all_repos)
+    progress_step = max(1, total // 10)
+    checked = 0
 
-                repos = await response.json()
-                if not repos:
-                    break
+    async def probe(idx: int, repo: Dict[str, Any]) -> bool:
+        nonlocal checked
 
-                all_repos.extend(repos)
-                logger.info(f"Fetched page {page} ({len(repos)} repos)")
-                page += 1
+        logger.debug("Checking %d/%d: %s", idx, total, repo["name"])
+        has_doc = await check_doc_folder(session, org, repo["name"])
 
-                # Stop if we got less than full page (last page)
-                if len(repos) < RESULTS_PER_PAGE:
-                    break
+        # Report progress every ~10% instead of once per repo
+        checked += 1
+        if checked % progress_step == 0 or checked == total:
+            logger.info("Checked %d/%d repos for /doc folder", checked, total)
 
-        logger.info(f"Total repos fetched: {len(all_repos)}")
+        return has_doc
 
-        # Check each repo for /doc folder
-        result = []
-        for idx, repo in enumerate(all_repos, 1):
-            logger.info(f"Checking {idx}/{len(all_repos)}: {repo['name']}")
-            has_doc = await check_doc_folder(session, org, repo["name"])
+    # A failed probe is logged and counts as "no /doc folder" rather than
+    # failing the scan
+    doc_flags = await asyncio.gather(
+        *(probe(idx, repo) for idx, repo in enumerate(all_repos, 1)),
+        return_exceptions=True
+    )
 
-            result.append({
-                "id": str(repo["id"]),
-                "name": repo["name"],
-                "description": repo.get("description") or "",
-                "url": repo["html_url"],
-                "hasDocFolder": has_doc
-            })
+    result = []
+    result_append = result.append
+    for repo, has_doc in zip(all_repos, doc_flags):
+        if isinstance(has_doc, BaseException):
+            logger.warning("/doc check failed for %s/%s: %r", org, repo.get("name"), has_doc)
+
+        result_append({
+            "id": str(repo["id"]),
+            "name": repo["name"],
+            "description": repo.get("description") or "",
+            "url": repo["html_url"],
+            "hasDocFolder": has_doc is True
+        })
 
-        repos_with_docs_count = sum(1 for r in result if r["hasDocFolder"])
-        logger.info(f"Found {repos_with_docs_count} repos with /doc folder")
+    repos_with_docs_count = sum(1 for r in result if r["hasDocFolder"])
+    logger.info("Found %d repos with /doc folder", repos_with_docs_count)
 
-        return result
+    return result
 
 
+@rate_limit_budget
 async def get_repo_docs(org: str, repo: str) -> List[Dict[str, Any]]:
     """
     Get all documentation files from a repository's /doc folder
@@ -224,66 +989,54 @@ async def get_repo_docs(org: str, repo: str) -> List[Dict[str, Any]]:
     Example:
         docs = await get_repo_docs("anthropics", "anthropic-sdk-python")
     """
-    async with aiohttp.ClientSession() as session:
-        headers = create_headers()
-        url = f"{GITHUB_API_BASE}/repos/{org}/{repo}/contents/doc"
-
-        logger.info(f"Fetching docs from: {org}/{repo}/doc")
-
-        async with session.get(url, headers=headers) as response:
-            if response.status == 404:
-                logger.warning(f"No /doc folder found in {org}/{repo}")
-                return []
+    session = await get_session()
+    url = CONTENTS_URL_TEMPLATE.format(org, repo, "doc")
+
+    logger.info(f"Fetching docs from: {org}/{repo}/doc")
+
+    status, contents, _ = await cached_get_json(session, url)
+    if status == 404:
+        logger.warning(f"No /doc folder found in {org}/{repo}")
+        return []
+
+    if status != 200:
+        raise Exception(f"GitHub API error {status}: {contents}")
+
+    docs = []
+    docs_append = docs.append
+    skipped = 0
+
+    for item in contents:
+        # Only process files (not directories)
+        if item["type"] == "file":
+            name = item["name"]
+
+            # Unsupported extensions map to 'unknown' (one cached lookup
+            # both filters and classifies the file)
+            content_type = determine_content_type(name)
+            if content_type != 'unknown':
+                docs_append({
+                    "id": item["sha"],
+                    "name": name,
+                    "path": item["path"],
+                    "type": content_type,
+                    "url": item["html_url"],
+                    "download_url": item.get("download_url", ""),
+                })
+            else:
+                skipped += 1
 
-            if response.status != 200:
-                error_text = await response.text()
-                raise Exception(f"GitHub API error {response.status}: {error_text}")
-
-            contents = await response.json()
-
-            # Filter for supported file types
-            supported_extensions = [
-                '.md',       # Markdown
-                '.mmd',      # Mermaid
-                '.mermaid',  # Mermaid
-                '.svg',      # SVG images
-                '.yml',      # YAML (OpenAPI)
-                '.yaml',     # YAML (OpenAPI)
-                '.json'      # JSON (OpenAPI/Postman)
-            ]
-
-            docs = []
-            skipped = 0
-
-            for item in contents:
-                # Only process files (not directories)
-                if item["type"] == "file":
-                    name = item["name"]
-
-                    # Check if file extension is supported
-                    if any(name.lower().endswith(ext) for ext in supported_extensions):
-                        content_type = determine_content_type(name)
-
-                        docs.append({
-                            "id": item["sha"],
-                            "name": name,
-                            "path": item["path"],
-                            "type": content_type,
-                            "url": item["html_url"],
-                            "download_url": item.get("download_url", ""),
-                        })
-                    else:
-                        skipped += 1
-
-            logger.info(f"Found {len(docs)} documentation files ({skipped} skipped)")
-            return docs
+    logger.info(f"Found {len(docs)} documentation files ({skipped} skipped)")
+    return docs
 
 
+@rate_limit_budget
 async def get_file_content(org: str, repo: str, path: str) -> Dict[str, Any]:
     """
     Fetch content of a specific file from GitHub
 
-    Decodes base64-encoded content returned by GitHub API
+    Decodes base64-encoded content returned by GitHub API. Files too large
+    for inline content are downloaded from their raw download_url instead.
 
     Args:
         org: GitHub organization name
@@ -302,88 +1055,103 @@ async def get_file_content(org: str, repo: str, path: str) -> Dict[str, Any]:
     Example:
         content = await get_file_content("anthropics", "sdk", "doc/README.md")
     """
-    async with aiohttp.ClientSession() as session:
-        headers = create_headers()
-        url = f"{GITHUB_API_BASE}/repos/{org}/{repo}/contents/{path}"
+    session = await get_session()
+    url = CONTENTS_URL_TEMPLATE.format(org, repo, path)
 
-        logger.info(f"Fetching content: {org}/{repo}/{path}")
+    logger.info(f"Fetching content: {org}/{repo}/{path}")
 
-        async with session.get(url, headers=headers) as response:
-            if response.status == 404:
-                raise Exception(f"File not found: {path}")
+    status, data, _ = await cached_get_json(session, url)
+    if status == 404:
+        raise Exception(f"File not found: {path}")
 
-            if response.status != 200:
-                error_text = await response.text()
-                raise Exception(f"GitHub API error {response.status}: {error_text}")
-
-            data = await response.json()
-
-            # Decode base64 content if present
-            content = ""
-            if "content" in data and data["content"]:
-                try:
-                    # GitHub returns base64-encoded content with newlines
-                    encoded_content = data["content"].replace('\n', '')
-                    content = base64.b64decode(encoded_content).decode('utf-8')
-                    logger.info(f"Decoded content ({len(content)} characters)")
-                except Exception as e:
-                    logger.warning(f"Failed to decode content: {e}")
-                    content = data.get("content", "")
-
-            return {
-                "name": data["name"],
-                "path": data["path"],
-                "content": content,
-                "encoding": data.get("encoding", "base64")
-            }
+    if status != 200:
+        raise Exception(f"GitHub API error {status}: {data}")
 
+    # Decode base64 content if present
+    content = ""
+    if "content" in data and data["content"]:
+        try:
+            encoded_content = data["content"]
+            if len(encoded_content) >= THREADED_DECODE_THRESHOLD:
+                # Keep large decodes from stalling concurrent GitHub requests
+                content = await asyncio.to_thread(decode_base64_content, encoded_content)
+            else:
+                content = decode_base64_content(encoded_content)
+            logger.info(f"Decoded content ({len(content)} characters)")
+        except Exception as e:
+            logger.warning(f"Failed to decode content: {e}")
+            content = data.get("content", "")
+    elif data.get("encoding") == "none" and data.get("download_url"):
+        # Files over 1 MB come back without inline content: use the raw CDN URL
+        content = await fetch_raw_content(session, data["download_url"], data.get("sha", ""))
+        logger.info(f"Downloaded raw content ({len(content)} characters)")
+
+    return {
+        "name": data["name"],
+        "path": data["path"],
+        "content": content,
+        "encoding": data.get("encoding", "base64")
+    }
 
+
+@rate_limit_budget
 async def search_documentation(org: str, query: str) -> List[Dict[str, Any]]:
-    async with aiohttp.ClientSession() as session:
-        headers = create_headers()
-        search_url = f"{GITHUB_API_BASE}/search/code"
-        params = {
-            "q": f"org:{org} path:/doc {query}",
-            "per_page": SEARCH_RESULTS_LIMIT
-        }
+    session = await get_session()
+    params = {
+        "q": f"org:{org} path:/doc {query}",
+        "per_page": SEARCH_RESULTS_LIMIT
+    }
 
-        logger.info(f"Searching for: '{query}' in {org}")
+    logger.info(f"Searching for: '{query}' in {org}")
 
-        async with session.get(search_url, headers=headers, params=params) as response:
-            if response.status == 403:
-                raise Exception("Search API rate limit exceeded. Try again later.")
+    status, data, _ = await cached_get_json(session, SEARCH_CODE_URL, params, SEARCH_CACHE_TTL)
+    if status == 403:
+        raise Exception("Search API rate limit exceeded. Try again later.")
 
-            if response.status != 200:
-                error_text = await response.text()
-                raise Exception(f"GitHub API error {response.status}: {error_text}")
+    if status != 200:
+        raise Exception(f"GitHub API error {status}: {data}")
 
-            data = await response.json()
-            results = []
+    results = []
+    results_append = results.append
 
-            for item in data.get("items", []):
-                repo_info = item.get("repository", {})
-                results.append({
-                    "name": item["name"],
-                    "path": item["path"],
-                    "repository": repo_info.get("name", ""),
-                    "url": item["html_url"],
-                })
+    for item in data.get("items", []):
+        repo_info = item.get("repository") or {}
+        results_append({
+            "name": item["name"],
+            "path": item["path"],
+            "repository": repo_info.get("name", ""),
+            "url": item["html_url"],
+        })
 
-            logger.info(f"Found {len(results)} matching files")
-            return results
+    logger.info(f"Found {len(results)} matching files")
+    return results
 
 
 # ============================================================================
 # Gradio MCP Tool Functions
 # ============================================================================
 
+def to_json(data: Any) -> str:
+    """
+    Serialize a tool result to an indented JSON string using orjson
+
+    Args:
+        data: JSON-serializable tool result
+
+    Returns:
+        JSON string with 2-space indentation
+    """
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+
+
 async def get_org_repos_tool(org: str) -> str:
     """
     Fetch all repositories from a GitHub organization with /doc folder detection.
 
     This tool uses the GitHub Search API to efficiently find repositories
-    that have a /doc folder, falling back to checking each repo individually
-    if the search API is unavailable.
+    that have a /doc folder. If search is unavailable it lists repositories
+    through GraphQL with the /doc check in the same query (requires a
+    token), and finally falls back to checking each repo individually.
 
     Args:
         org (str): GitHub organization name (e.g., "microsoft", "anthropics")
@@ -393,9 +1161,9 @@ async def get_org_repos_tool(org: str) -> str:
     """
     try:
         result = await get_org_repos(org)
-        return json.dumps(result, indent=2)
+        return to_json(result)
     except Exception as e:
-        return json.dumps({"error": str(e)}, indent=2)
+        return to_json({"error": str(e)})
 
 
 async def get_repo_docs_tool(org: str, repo: str) -> str:
@@ -413,9 +1181,9 @@ async def get_repo_docs_tool(org: str, repo: str) -> str:
     """
     try:
         result = await get_repo_docs(org, repo)
-        return json.dumps(result, indent=2)
+        return to_json(result)
     except Exception as e:
-        return json.dumps({"error": str(e)}, indent=2)
+        return to_json({"error": str(e)})
 
 
 async def get_file_content_tool(org: str, repo: str, path: str) -> str:
@@ -434,9 +1202,9 @@ async def get_file_content_tool(org: str, repo: str, path: str) -> str:
     """
     try:
         result = await get_file_content(org, repo, path)
-        return json.dumps(result, indent=2)
+        return to_json(result)
     except Exception as e:
-        return json.dumps({"error": str(e)}, indent=2)
+        return to_json({"error": str(e)})
 
 
 async def search_documentation_tool(org: str, query: str) -> str:
@@ -454,9 +1222,9 @@ async def search_documentation_tool(org: str, query: str) -> str:
     """
     try:
         result = await search_documentation(org, query)
-        return json.dumps(result, indent=2)
+        return to_json(result)
     except Exception as e:
-        return json.dumps({"error": str(e)}, indent=2)
+        return to_json({"error": str(e)})
 
 
 # ============================================================================
@@ -519,4 +1287,9 @@ demo = gr.TabbedInterface(
 # ============================================================================
 
 if __name__ == "__main__":
-    demo.launch(mcp_server=True, server_name="0.0.0.0", server_port=7860)
+    demo.launch(
+        mcp_server=True,
+        server_name="0.0.0.0",
+        server_port=7860,
+        app_kwargs={"lifespan": session_lifespan},
+    )